@@ -5,16 +5,25 @@ import threading
 import pandas as pd
 from tqdm import tqdm
 import argparse
-import pandas as pd
+from sampling import StratifiedReservoirSampler, stream_sample
+from query_fields import PROFILES, ResponseStats, selection_set
+
+# Property, parcel and building lookups are one GraphQL call each.
+CALLS_PER_ROW = 3
 
 class propertyDataPrecisely:
-    def __init__(self, client_id, client_secret, sample_percentage=100):
+    def __init__(self, client_id, client_secret, sample_percentage=100, stratify_by=None, api_budget=None,
+                 field_profile="full"):
         self.client_id = client_id
         self.client_secret = client_secret
         self.auth_token = self.get_new_token() 
         self.token_expiry_time = time.time() + (59 * 60)  
         self.url = "https://api.cloud.precisely.com/data-graph/graphql/"
         self.sample_percentage = sample_percentage
+        self.stratify_by = stratify_by
+        self.api_budget = api_budget
+        self.field_profile = field_profile
+        self.response_stats = ResponseStats(field_profile)
         self.auto_refresh_token()
         self.last_processed_index = 0
         self.resume_file = "resume_data.json"
@@ -64,7 +73,7 @@ class propertyDataPrecisely:
 
         threading.Thread(target=refresh_loop, daemon=True).start()
 
-    def fetch_data(self, query):
+    def fetch_data(self, query, dataset=None):
         """
         Function to fetch data from API with error handling and retries.
         """
@@ -76,7 +85,7 @@ class propertyDataPrecisely:
             response = requests.post(self.url, json={"query": query}, headers=headers)
             if response.status_code == 200:
                 try:
-                    return response.json()
+                    return self.response_stats.parse(dataset, response)
                 except ValueError as e:
                     print(f"Error parsing JSON: {e}")
             elif response.status_code == 401:
@@ -103,11 +112,11 @@ class propertyDataPrecisely:
                 return None
         return data
 
-    def get_data(self, query, *path):
+    def get_data(self, query, *path, dataset=None):
         """
         Generic function to retrieve data using a GraphQL query.
         """
-        response = self.fetch_data(query)
+        response = self.fetch_data(query, dataset)
         return self.safe_get(response, *path)
 
     def build_address(self, row):
@@ -160,18 +169,13 @@ class propertyDataPrecisely:
             getByAddress(address: "{address}") {{
                 propertyAttributes {{
                     data {{
-                        livingSquareFootage
-                        bedroomCount
-                        bathroomCount {{
-                            value
-                        }}
-                        saleAmount
+{selection_set('property', self.field_profile, indent=24)}
                     }}
                 }}
             }}
         }}
         """
-        return self.get_data(query, "data", "getByAddress", "propertyAttributes", "data", 0)
+        return self.get_data(query, "data", "getByAddress", "propertyAttributes", "data", 0, dataset="property")
 
     def get_parcel_data(self, address):
         query = f"""
@@ -179,16 +183,13 @@ class propertyDataPrecisely:
             getByAddress(address: "{address}") {{
                 parcels {{
                     data {{
-                        parcelID
-                        parcelArea
-                        elevation
-                        geometry
+{selection_set('parcel', self.field_profile, indent=24)}
                     }}
                 }}
             }}
         }}
         """
-        return self.get_data(query, "data", "getByAddress", "parcels", "data", 0)
+        return self.get_data(query, "data", "getByAddress", "parcels", "data", 0, dataset="parcel")
 
     def get_building_data(self, address):
         query = f"""
@@ -196,23 +197,35 @@ class propertyDataPrecisely:
             getByAddress(address: "{address}") {{
                 buildings {{
                     data {{
-                        buildingID
-                        maximumElevation
-                        minimumElevation
-                        buildingArea
+{selection_set('building', self.field_profile, indent=24)}
                     }}
                 }}
             }}
         }}
         """
-        return self.get_data(query, "data", "getByAddress", "buildings", "data", 0)
+        return self.get_data(query, "data", "getByAddress", "buildings", "data", 0, dataset="building")
+
+    def sampler_args(self):
+        return {
+            "sample_percentage": self.sample_percentage,
+            "stratify_by": self.stratify_by,
+            "api_budget": self.api_budget,
+            "calls_per_row": CALLS_PER_ROW,
+        }
 
     def sample_data(self, df):
         """
-        Sample a percentage of the DataFrame.
+        Sample a percentage of an in-memory DataFrame, stratified and capped by the API budget.
+        """
+        sampler = StratifiedReservoirSampler(**self.sampler_args())
+        sampler.add(df)
+        return sampler.sample()
+
+    def stream_sample_data(self, file_path, start_row=0, end_row=None):
+        """
+        Sample rows while streaming the CSV, so the full input is never loaded.
         """
-        sample_size = int(len(df) * (self.sample_percentage / 100)) 
-        return df.sample(n=sample_size, random_state=42)
+        return stream_sample(file_path, start_row, end_row, **self.sampler_args())
 
 def main():
     # Set up argument parsing
@@ -224,21 +237,25 @@ def main():
     parser.add_argument('--start_row', type=int, default=0, help="Starting row index for the subset of data.")
     parser.add_argument('--end_row', type=int, help="Ending row index for the subset of data.")
     parser.add_argument('--sample_percentage', type=int, default=100, help="Percentage of data to sample.")
+    parser.add_argument('--stratify_by', type=str, help="Stratify the sample by 'zip', 'district', 'building' or a column name.")
+    parser.add_argument('--api_budget', type=int, help=f"Maximum number of API calls ({CALLS_PER_ROW} per row).")
+    parser.add_argument('--field_profile', type=str, default='full', choices=list(PROFILES),
+                        help="Field selection profile used to build the GraphQL queries.")
 
     args = parser.parse_args()
 
-    # Load and subset the data
-    df = pd.read_csv(args.file_path)
-    df = df[args.start_row:args.end_row] if args.end_row else df[args.start_row:]
-    print(f"Loaded data from {args.file_path}. Subsetting rows {args.start_row} to {args.end_row}.")
-    # Initialize the API and enhance the data
-    api = propertyDataPrecisely(args.client_id, args.client_secret, sample_percentage=args.sample_percentage)
-    sampled_df = api.sample_data(df)
+    # Initialize the API, then sample while streaming the requested subset
+    api = propertyDataPrecisely(args.client_id, args.client_secret, sample_percentage=args.sample_percentage,
+                                stratify_by=args.stratify_by, api_budget=args.api_budget,
+                                field_profile=args.field_profile)
+    sampled_df = api.stream_sample_data(args.file_path, args.start_row, args.end_row)
+    print(f"Sampled {len(sampled_df)} rows from {args.file_path} (rows {args.start_row} to {args.end_row}).")
     enhanced_df = api.enhance_data(sampled_df)
 
     # Save the enhanced data
     enhanced_df.to_csv(args.output_path, index=False)
     print(f"Data enrichment completed and saved to {args.output_path}.")
+    api.response_stats.report()
 
 if __name__ == "__main__":
     main()
@@ -10,12 +10,19 @@ from tqdm import tqdm
 import argparse
 from typing import Optional, Tuple
 from pandas import json_normalize
+from sampling import stream_sample
+from query_fields import PROFILES, ResponseStats, output_columns, profile_filename, selection_set
+
+# psyteGeodemographics, coastalRisk and floodRisk are one GraphQL call each.
+CALLS_PER_ROW = 3
 
 
 class demographicsDataPrecisely:
-    def __init__(self, client_id, client_secret):
+    def __init__(self, client_id, client_secret, field_profile="full"):
         self.client_id = client_id
         self.client_secret = client_secret
+        self.field_profile = field_profile
+        self.response_stats = ResponseStats(field_profile)
         self.auth_token = None
         self.token_expiry_time = None
         self.url = "https://api.cloud.precisely.com/data-graph/graphql"
@@ -61,13 +68,13 @@ class demographicsDataPrecisely:
             precisely_id = row['PBKEY']
 
             psyte_query = self.generate_psyteGeodemographics_query(precisely_id)
-            psyte_response = self.get_response(psyte_query)
+            psyte_response = self.get_response(psyte_query, dataset="psyte")
             
             coastal_risk_query = self.generate_coastalRisk_query(precisely_id)
-            coastal_risk_response = self.get_response(coastal_risk_query)
+            coastal_risk_response = self.get_response(coastal_risk_query, dataset="coastal")
             
             flood_risk_query = self.generate_floodRisk_query(precisely_id)
-            flood_risk_response = self.get_response(flood_risk_query)
+            flood_risk_response = self.get_response(flood_risk_query, dataset="flood")
             
             results.append({
                 "precisely_id": precisely_id,
@@ -78,7 +85,7 @@ class demographicsDataPrecisely:
         return results
 
     def generate_psyteGeodemographics_query(self, precisely_id):
-        # GraphQL query for psyteGeodemographics (same as before)
+        # GraphQL query for psyteGeodemographics, fields from the active profile
         return f"""
         query addressByPreciselyID {{
           getById(id: "{precisely_id}", queryType: PRECISELY_ID) {{
@@ -86,35 +93,7 @@ class demographicsDataPrecisely:
               data {{
                 psyteGeodemographics {{
                   data {{
-                    PSYTECategoryCode
-                    PSYTEGroupCode
-                    PSYTESegmentCode {{
-                      description
-                    }}
-                    censusBlock
-                    censusBlockGroup
-                    censusBlockPopulation
-                    censusBlockHouseholds
-                    householdIncomeVariable {{
-                      value
-                      description
-                    }}
-                    propertyValueVariable {{
-                      value
-                      description
-                    }}
-                    propertyTenureVariable {{
-                      value
-                      description
-                    }}
-                    propertyTypeVariable {{
-                      value
-                      description
-                    }}
-                    urbanRuralVariable {{
-                      value
-                      description
-                    }}
+{selection_set('psyte', self.field_profile, indent=20)}
                   }}
                 }}
               }}
@@ -124,7 +103,7 @@ class demographicsDataPrecisely:
         """
 
     def generate_coastalRisk_query(self, precisely_id):
-        # GraphQL query for coastalRisk (same as before)
+        # GraphQL query for coastalRisk, fields from the active profile
         return f"""
         query coastalRisk {{
             getById(id: "{precisely_id}", queryType: PRECISELY_ID) {{
@@ -132,18 +111,7 @@ class demographicsDataPrecisely:
                     data {{
                         coastalRisk {{
                             data {{
-                                preciselyID
-                                waterbodyName
-                                nearestWaterbodyCounty
-                                nearestWaterbodyState
-                                nearestWaterbodyType {{
-                                    value
-                                    description
-                                }}
-                                nearestWaterbodyAdjacentName
-                                nearestWaterbodyAdjacentType
-                                distanceToNearestCoastFeet
-                                windpoolDescription
+{selection_set('coastal', self.field_profile, indent=32)}
                             }}
                         }}
                     }}
@@ -153,7 +121,7 @@ class demographicsDataPrecisely:
         """
 
     def generate_floodRisk_query(self, precisely_id):
-        # GraphQL query for floodRisk (same as before)
+        # GraphQL query for floodRisk, fields from the active profile
         return f"""
         query floodRisk {{
           getById(id: "{precisely_id}", queryType: PRECISELY_ID) {{
@@ -161,28 +129,7 @@ class demographicsDataPrecisely:
               data {{
                 floodRisk {{
                   data {{
-                    preciselyID
-                    floodID
-                    femaMapPanelIdentifier
-                    floodZoneMapType
-                    stateFIPS
-                    floodZoneBaseFloodElevationFeet
-                    floodZone
-                    additionalInformation
-                    baseFloodElevationFeet
-                    communityNumber
-                    communityStatus
-                    mapEffectiveDate
-                    letterOfMapRevisionDate
-                    letterOfMapRevisionCaseNumber
-                    floodHazardBoundaryMapInitialDate
-                    floodInsuranceRateMapInitialDate
-                    addressLocationElevationFeet
-                    year100FloodZoneDistanceFeet
-                    year500FloodZoneDistanceFeet
-                    elevationProfileToClosestWaterbodyFeet
-                    distanceToNearestWaterbodyFeet
-                    nameOfNearestWaterbody
+{selection_set('flood', self.field_profile, indent=20)}
                   }}
                 }}
               }}
@@ -191,18 +138,19 @@ class demographicsDataPrecisely:
         }}
         """
 
-    def get_response(self, query):
+    def get_response(self, query, dataset=None):
         payload = {"query": query}
         response = requests.post(self.url, json=payload, headers=self.headers)
 
         if response.status_code == 200:
-            return response.json()
+            return self.response_stats.parse(dataset, response)
         else:
             raise Exception(f"Query failed with status code {response.status_code}: {response.text}")
         
 class dataProcessorForDemographics:
-    def __init__(self, results):
+    def __init__(self, results, field_profile="full"):
         self.results = results
+        self.field_profile = field_profile
         self.combined_df = None
 
     def extract_data(self, result):
@@ -273,10 +221,11 @@ class dataProcessorForDemographics:
         
         self.combined_df = pd.concat(combined_data, ignore_index=True)
         
-        # Reorder columns
+        # Reorder columns, keeping every registry column whatever field profile was queried
         cols = self.combined_df.columns.tolist()
-        cols = ['precisely_id'] + [col for col in cols if col != 'precisely_id']
-        self.combined_df = self.combined_df[cols]
+        expected = output_columns('psyte', 'psyte') + output_columns('coastal', 'coastal') + output_columns('flood', 'flood')
+        cols = ['precisely_id'] + expected + [col for col in cols if col != 'precisely_id' and col not in expected]
+        self.combined_df = self.combined_df.reindex(columns=cols)
 
     def get_dataframe(self):
         if self.combined_df is None:
@@ -284,6 +233,8 @@ class dataProcessorForDemographics:
         return self.combined_df
 
     def save_to_csv(self, filename='../data/combined_precisely_data3.csv'):
+        # Non-full profiles write to their own file, so appending never replaces full rows with partial ones
+        filename = profile_filename(filename, self.field_profile)
         if self.combined_df is None:
             self.create_combined_dataframe()
         
@@ -343,7 +294,15 @@ if __name__ == "__main__":
     
     # Optional arguments
     parser.add_argument('--row-range', default=':',
-                      help='Row range to process in format "start:end" (e.g., "18000:20000"). Default is all rows')
+                      help='Non-negative row range to process in format "start:end" (e.g., "18000:20000"). Default is all rows')
+    parser.add_argument('--sample-percentage', type=int, default=100,
+                      help='Percentage of the row range to sample. Default is 100')
+    parser.add_argument('--stratify-by',
+                      help="Stratify the sample by 'zip', 'district', 'building' or a column name")
+    parser.add_argument('--api-budget', type=int,
+                      help=f'Maximum number of API calls ({CALLS_PER_ROW} per row)')
+    parser.add_argument('--field-profile', default='full', choices=list(PROFILES),
+                      help='Field selection profile used to build the GraphQL queries. Default is full')
     
     # Parse arguments
     args = parser.parse_args()
@@ -352,31 +311,30 @@ if __name__ == "__main__":
         # Parse row range
         start_row, end_row = parse_row_range(args.row_range)
         
-        # Read data with row range
-        if start_row is not None and end_row is not None:
-            df = pd.read_csv(args.input_file).iloc[start_row:end_row]
-        elif start_row is not None:
-            df = pd.read_csv(args.input_file).iloc[start_row:]
-        elif end_row is not None:
-            df = pd.read_csv(args.input_file).iloc[:end_row]
-        else:
-            df = pd.read_csv(args.input_file)
+        # Stream the row range and sample it before any API call
+        df = stream_sample(args.input_file, start_row, end_row,
+                           sample_percentage=args.sample_percentage,
+                           stratify_by=args.stratify_by,
+                           api_budget=args.api_budget,
+                           calls_per_row=CALLS_PER_ROW)
+        print(f"Sampled {len(df)} rows from {args.input_file}")
         
         # Initialize API client
-        precisely_api = demographicsDataPrecisely(args.client_id, args.client_secret)
+        precisely_api = demographicsDataPrecisely(args.client_id, args.client_secret, field_profile=args.field_profile)
         
         # Process data
         results = precisely_api.process_dataframe(df)
         print("Processing complete. Results: ", results)
         
         # Process and save results
-        processor = dataProcessorForDemographics(results, output_dir=args.output_dir)
+        processor = dataProcessorForDemographics(results, output_dir=args.output_dir, field_profile=args.field_profile)
         combined_df = processor.get_dataframe()
         print("Combined Dataframe:")
         print(combined_df.head())
         
         processor.save_to_csv()
         processor.print_info()
+        precisely_api.response_stats.report()
         
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -387,4 +345,6 @@ if __name__ == "__main__":
 #                  --client-secret "your_client_secret" \
 #                  --input-file "../data/filtered_data.csv" \
 #                  --output-dir "../data/output.csv" \
-#                  --row-range "18000:20000"
\ No newline at end of file
+#                  --row-range "18000:20000" \
+#                  --stratify-by zip \
+#                  --api-budget 3000
\ No newline at end of file
@@ -0,0 +1,449 @@
+import os
+import gzip
+import json
+import math
+import argparse
+from itertools import combinations
+import numpy as np
+import pandas as pd
+
+# Dimension name -> candidate columns, first one present in the data wins.
+DIMENSIONS = {
+    "property_type": ["psyte_propertyTypeVariable.description"],
+    "property_value": ["psyte_propertyValueVariable.description"],
+    "income": ["psyte_householdIncomeVariable.description"],
+    "tenure": ["psyte_propertyTenureVariable.description"],
+    "urban_rural": ["psyte_urbanRuralVariable.description"],
+    "zip": ["ZIPCODE", "POSTCODE"],
+    "psyte_group": ["psyte_PSYTEGroupCode"],
+    "cluster": ["Cluster", "NewCluster", "cluster_labels"],
+}
+
+MEASURES = [
+    "SaleAmount", "LivingSquareFootage", "BedroomCount", "BathroomCount",
+    "ParcelArea", "Elevation", "coastal_distanceToNearestCoastFeet",
+]
+
+# Relative accuracy of the quantile sketches (1% of the true value).
+SKETCH_ACCURACY = 0.01
+
+AGGREGATIONS = {"n": "sum", "sum": "sum", "sumsq": "sum", "min": "min", "max": "max"}
+
+
+class AggregateCube:
+    """
+    Materialized count/sum/mean/quantile aggregates over the enriched data.
+
+    Every single dimension and every pair of dimensions is precomputed as a
+    cuboid holding, per cell, the row count and the n/sum/sum of squares/min/max
+    of each measure. Quantiles come from log-bucketed sketches kept for the
+    whole data set and for each single-dimension cell. All parts are
+    mergeable, so new enriched rows are folded in with update() without
+    rereading the data that is already in the cube. A hash of every ingested
+    row is kept next to the cube file, so rows that were ingested by an earlier
+    build or update are not counted twice. Repeats inside the input being
+    ingested are always counted, like value_counts() and crosstab() would.
+    """
+
+    def __init__(self, dimensions=None, measures=None, accuracy=SKETCH_ACCURACY):
+        self.dimension_candidates = dimensions or DIMENSIONS
+        self.measures = measures or MEASURES
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.dimensions = None
+        self.cuboids = {}
+        self.sketches = None
+        self.moments = None
+        self.rows = 0
+        self.duplicates = 0
+        self.sources = []
+        self.stored_hashes = np.array([], dtype=np.uint64)
+        self.new_hashes = []
+
+    def resolve_dimensions(self, columns):
+        """
+        Pick the source column of every dimension present in the data.
+        """
+        dimensions = {}
+        for name, candidates in self.dimension_candidates.items():
+            for col in candidates:
+                if col in columns:
+                    dimensions[name] = col
+                    break
+        return dimensions
+
+    @staticmethod
+    def dimension_values(series):
+        """
+        Normalize dimension values to strings so cells match across updates
+        (e.g. a ZIP code read as 19104 in one file and 19104.0 in another).
+        """
+        if pd.api.types.is_numeric_dtype(series):
+            numeric = series.astype(float)
+            if (numeric.dropna() % 1 == 0).all():
+                return numeric.astype("Int64").astype(str).where(numeric.notna())
+        return series.astype(str).str.strip().where(series.notna())
+
+    @classmethod
+    def row_hashes(cls, df):
+        """
+        Hash whole rows, independently of column order and of the dtypes
+        read_csv happened to infer.
+        """
+        normalized = pd.DataFrame({col: cls.dimension_values(df[col]) for col in sorted(df.columns)}, index=df.index)
+        return pd.util.hash_pandas_object(normalized.fillna(""), index=False).to_numpy()
+
+    def drop_seen(self, df):
+        """
+        Drop rows already ingested by an earlier build or update of this cube.
+        """
+        hashes = self.row_hashes(df)
+        repeat = np.isin(hashes, self.stored_hashes)
+        self.duplicates += int(repeat.sum())
+        self.new_hashes.append(hashes[~repeat])
+        return df[~repeat]
+
+    def record_source(self, path, rows):
+        """
+        Remember which file (and which version of it) was folded into the cube.
+        """
+        path = os.path.realpath(path)
+        self.sources.append({"path": path, "mtime": os.path.getmtime(path), "rows": rows})
+
+    def covers(self, path):
+        """
+        Whether the current version of a file was folded into the cube.
+        """
+        path = os.path.realpath(path)
+        return os.path.exists(path) and any(
+            source["path"] == path and source["mtime"] == os.path.getmtime(path) for source in self.sources)
+
+    def prepare(self, df):
+        """
+        Project a chunk of enriched rows onto the cube dimensions and measures.
+        """
+        frame = pd.DataFrame(index=df.index)
+        for name, col in self.dimensions.items():
+            frame[name] = self.dimension_values(df[col]) if col in df else np.nan
+        for measure in self.measures:
+            frame[measure] = pd.to_numeric(df[measure], errors="coerce") if measure in df else np.nan
+        return frame
+
+    def aggregate(self, frame, dims):
+        """
+        Aggregate a prepared chunk into one cuboid.
+        """
+        parts = {"count": frame.groupby(list(dims)).size()}
+        grouped = frame.groupby(list(dims))
+        for measure in self.measures:
+            values = frame[measure]
+            parts[f"{measure}_n"] = values.notna().groupby([frame[d] for d in dims]).sum()
+            parts[f"{measure}_sum"] = grouped[measure].sum()
+            parts[f"{measure}_sumsq"] = (values ** 2).groupby([frame[d] for d in dims]).sum()
+            parts[f"{measure}_min"] = grouped[measure].min()
+            parts[f"{measure}_max"] = grouped[measure].max()
+        return pd.DataFrame(parts)
+
+    @staticmethod
+    def merge_cells(left, right):
+        """
+        Merge two aggregates of the same cuboid.
+        """
+        if left is None:
+            return right
+        combined = pd.concat([left, right])
+        how = {col: AGGREGATIONS.get(col.rsplit("_", 1)[-1], "sum") for col in combined.columns}
+        return combined.groupby(level=list(range(combined.index.nlevels))).agg(how)
+
+    def sketch_buckets(self, values):
+        """
+        Map values to signed log buckets: bucket i holds gamma^(i-1) < |x| <= gamma^i,
+        zero gets its own bucket.
+        """
+        magnitude = values.abs()
+        sign = np.sign(values).astype(int)
+        bucket = np.ceil(np.log(magnitude.where(magnitude > 0)) / math.log(self.gamma))
+        return sign, bucket.fillna(0).astype(int)
+
+    def build_sketches(self, frame):
+        """
+        Count sketch buckets per measure for the whole chunk ("all") and for
+        every single-dimension cell.
+        """
+        parts = []
+        for measure in self.measures:
+            values = frame[measure]
+            present = values.notna()
+            if not present.any():
+                continue
+            sign, bucket = self.sketch_buckets(values[present])
+            base = pd.DataFrame({"sign": sign, "bucket": bucket})
+            scopes = [("all", pd.Series("all", index=base.index))]
+            scopes += [(name, frame.loc[present, name]) for name in self.dimensions]
+            for scope, cell in scopes:
+                counts = base.groupby([cell, base["sign"], base["bucket"]]).size()
+                if counts.empty:
+                    continue
+                counts.index.names = ["cell", "sign", "bucket"]
+                counts = counts.reset_index(name="count")
+                counts.insert(0, "dimension", scope)
+                counts.insert(0, "measure", measure)
+                parts.append(counts)
+        if not parts:
+            return None
+        return pd.concat(parts, ignore_index=True)
+
+    def build_moments(self, frame):
+        """
+        Pairwise-complete moments of the measures, enough to rebuild DataFrame.corr().
+        """
+        values = frame[self.measures].to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        mask = present.astype(float)
+        return {
+            "n": mask.T @ mask,
+            "sum_x": filled.T @ mask,
+            "sum_xx": (filled ** 2).T @ mask,
+            "sum_xy": filled.T @ filled,
+            "min": np.nanmin(np.where(present, values, np.inf), axis=0),
+            "max": np.nanmax(np.where(present, values, -np.inf), axis=0),
+        }
+
+    def update(self, df):
+        """
+        Fold a chunk of enriched rows into the cube.
+        """
+        if self.dimensions is None:
+            self.dimensions = self.resolve_dimensions(df.columns)
+        df = self.drop_seen(df)
+        if df.empty:
+            return self
+        frame = self.prepare(df)
+        self.rows += len(frame)
+
+        names = list(self.dimensions)
+        for dims in list(combinations(names, 1)) + list(combinations(names, 2)):
+            key = "|".join(dims)
+            self.cuboids[key] = self.merge_cells(self.cuboids.get(key), self.aggregate(frame, dims))
+
+        sketches = self.build_sketches(frame)
+        if sketches is not None:
+            combined = pd.concat([self.sketches, sketches], ignore_index=True) if self.sketches is not None else sketches
+            self.sketches = combined.groupby(
+                ["measure", "dimension", "cell", "sign", "bucket"], as_index=False)["count"].sum()
+
+        moments = self.build_moments(frame)
+        if self.moments is None:
+            self.moments = moments
+        else:
+            merge = {"min": np.fmin, "max": np.fmax}
+            self.moments = {name: merge.get(name, np.add)(self.moments[name], moments[name]) for name in moments}
+        return self
+
+    def cuboid(self, *dims):
+        """
+        Return the cuboid for one or two dimensions, whatever order they are given in.
+        """
+        for key in ("|".join(dims), "|".join(reversed(dims))):
+            if key in self.cuboids:
+                cells = self.cuboids[key]
+                if list(cells.index.names) != list(dims):
+                    cells = cells.reorder_levels(list(dims))
+                return cells
+        raise KeyError(f"No cuboid for dimensions {dims}. Available dimensions: {list(self.dimensions)}")
+
+    def _pivot(self, series, dims):
+        if len(dims) == 2:
+            return series.unstack(fill_value=0 if series.dtype.kind in "iu" else np.nan)
+        return series
+
+    def count(self, *dims):
+        """
+        Row counts, equivalent to value_counts() for one dimension and
+        pd.crosstab() for two.
+        """
+        return self._pivot(self.cuboid(*dims)["count"], dims)
+
+    def sum(self, measure, *dims):
+        return self._pivot(self.cuboid(*dims)[f"{measure}_sum"], dims)
+
+    def mean(self, measure, *dims):
+        """
+        Mean of a measure per cell, equivalent to groupby(dims)[measure].mean().
+        """
+        cells = self.cuboid(*dims)
+        n = cells[f"{measure}_n"]
+        return self._pivot(cells[f"{measure}_sum"] / n.where(n > 0), dims)
+
+    def std(self, measure, *dims):
+        cells = self.cuboid(*dims)
+        n = cells[f"{measure}_n"]
+        variance = (cells[f"{measure}_sumsq"] - cells[f"{measure}_sum"] ** 2 / n) / (n - 1).where(n > 1)
+        return self._pivot(np.sqrt(variance.clip(lower=0)), dims)
+
+    def _sketch(self, measure, dimension="all", cell="all"):
+        sketches = self.sketches
+        selected = sketches[(sketches["measure"] == measure) & (sketches["dimension"] == dimension)
+                            & (sketches["cell"] == cell)]
+        # Sort ascending by value: negatives by decreasing magnitude, then zero, then positives.
+        order = np.where(selected["sign"] < 0, -selected["bucket"], selected["bucket"])
+        keys = selected["sign"].to_numpy() * 1e9 + order
+        return selected.iloc[np.argsort(keys, kind="stable")]
+
+    def _bucket_value(self, sign, bucket):
+        if sign == 0:
+            return 0.0
+        return sign * 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def quantile(self, measure, q=0.5, dimension="all", cell="all"):
+        """
+        Approximate quantile(s) of a measure, overall or within one cell of a
+        single dimension, within SKETCH_ACCURACY relative error.
+        """
+        sketch = self._sketch(measure, dimension, cell)
+        if sketch.empty:
+            return np.nan if np.isscalar(q) else [np.nan] * len(q)
+        cumulative = sketch["count"].cumsum().to_numpy()
+        total = cumulative[-1]
+        signs, buckets = sketch["sign"].to_numpy(), sketch["bucket"].to_numpy()
+
+        def single(p):
+            position = np.searchsorted(cumulative, p * (total - 1), side="right")
+            position = min(position, len(cumulative) - 1)
+            return self._bucket_value(signs[position], buckets[position])
+
+        return single(q) if np.isscalar(q) else [single(p) for p in q]
+
+    def _count_at_most(self, sketch, value):
+        values = np.array([self._bucket_value(s, b) for s, b in zip(sketch["sign"], sketch["bucket"])])
+        return sketch["count"].to_numpy()[values <= value].sum()
+
+    def quantile_crosstab(self, measure, dimension, q=5, labels=None):
+        """
+        Counts per cell of a dimension for each of q global quantile bins of a
+        measure, equivalent to pd.crosstab(df[dimension], pd.qcut(df[measure], q)).
+        """
+        edges = self.quantile(measure, [i / q for i in range(1, q)])
+        labels = labels or [f"Q{i + 1}" for i in range(q)]
+        cells = self.sketches.loc[(self.sketches["measure"] == measure)
+                                  & (self.sketches["dimension"] == dimension), "cell"].unique()
+        rows = {}
+        for cell in sorted(cells):
+            sketch = self._sketch(measure, dimension, cell)
+            cumulative = [self._count_at_most(sketch, edge) for edge in edges] + [sketch["count"].sum()]
+            rows[cell] = np.diff([0] + cumulative)
+        table = pd.DataFrame.from_dict(rows, orient="index", columns=labels)
+        table.index.name = dimension
+        return table
+
+    def describe(self, measure):
+        """
+        Summary of a measure in the layout of Series.describe().
+        """
+        i = self.measures.index(measure)
+        n = self.moments["n"][i, i]
+        mean = self.moments["sum_x"][i, i] / n if n else np.nan
+        variance = (self.moments["sum_xx"][i, i] - n * mean ** 2) / (n - 1) if n > 1 else np.nan
+        quartiles = self.quantile(measure, [0.25, 0.5, 0.75])
+        return pd.Series({
+            "count": n, "mean": mean, "std": math.sqrt(max(variance, 0)) if n > 1 else np.nan,
+            "min": self.moments["min"][i] if n else np.nan, "25%": quartiles[0], "50%": quartiles[1],
+            "75%": quartiles[2], "max": self.moments["max"][i] if n else np.nan,
+        }, name=measure)
+
+    def corr(self, measures=None):
+        """
+        Pearson correlation over pairwise-complete rows, equivalent to df[measures].corr().
+        """
+        measures = measures or self.measures
+        idx = [self.measures.index(m) for m in measures]
+        n = self.moments["n"][np.ix_(idx, idx)]
+        sum_x = self.moments["sum_x"][np.ix_(idx, idx)]
+        sum_y = sum_x.T
+        sum_xx = self.moments["sum_xx"][np.ix_(idx, idx)]
+        sum_yy = sum_xx.T
+        sum_xy = self.moments["sum_xy"][np.ix_(idx, idx)]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = sum_xy - sum_x * sum_y / n
+            var_x = sum_xx - sum_x ** 2 / n
+            var_y = sum_yy - sum_y ** 2 / n
+            corr = cov / np.sqrt(var_x * var_y)
+        return pd.DataFrame(corr, index=measures, columns=measures)
+
+    @staticmethod
+    def hashes_path(path):
+        base = path[:-len(".json.gz")] if path.endswith(".json.gz") else path
+        return f"{base}.rows.npy"
+
+    def save(self, path):
+        """
+        Store the cube as gzipped JSON, with the ingested row hashes in a .rows.npy file next to it.
+        """
+        state = {
+            "accuracy": self.accuracy,
+            "measures": self.measures,
+            "dimensions": self.dimensions,
+            "rows": self.rows,
+            "duplicates": self.duplicates,
+            "sources": self.sources,
+            "cuboids": {key: cells.reset_index().to_dict(orient="split", index=False)
+                        for key, cells in self.cuboids.items()},
+            "sketches": None if self.sketches is None else self.sketches.to_dict(orient="split", index=False),
+            "moments": {name: matrix.tolist() for name, matrix in self.moments.items()},
+        }
+        with gzip.open(path, "wt") as f:
+            json.dump(state, f, default=lambda value: None if pd.isna(value) else value.item())
+        np.save(self.hashes_path(path), np.unique(np.concatenate([self.stored_hashes] + self.new_hashes)))
+        print(f"Aggregate cube ({self.rows} rows, {self.duplicates} repeated rows skipped) saved to {path}")
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt") as f:
+            state = json.load(f)
+        cube = cls(measures=state["measures"], accuracy=state["accuracy"])
+        cube.dimensions = state["dimensions"]
+        cube.rows = state["rows"]
+        cube.duplicates = state.get("duplicates", 0)
+        cube.sources = state.get("sources", [])
+        if os.path.exists(cls.hashes_path(path)):
+            cube.stored_hashes = np.load(cls.hashes_path(path))
+        for key, split in state["cuboids"].items():
+            cells = pd.DataFrame(split["data"], columns=split["columns"])
+            dims = key.split("|")
+            cells[dims] = cells[dims].astype(str)
+            cube.cuboids[key] = cells.set_index(dims)
+        if state["sketches"] is not None:
+            cube.sketches = pd.DataFrame(state["sketches"]["data"], columns=state["sketches"]["columns"])
+        cube.moments = {name: np.array(matrix, dtype=float) for name, matrix in state["moments"].items()}
+        return cube
+
+
+def build_cube(file_path, cube=None, chunksize=50000):
+    """
+    Stream an enriched CSV into a (new or existing) cube in a single pass.
+    """
+    cube = cube or AggregateCube()
+    rows = 0
+    for chunk in pd.read_csv(file_path, chunksize=chunksize, low_memory=False):
+        cube.update(chunk)
+        rows += len(chunk)
+    cube.record_source(file_path, rows)
+    return cube
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the aggregate cube used by the visualization notebooks.")
+    parser.add_argument('file_path', type=str, help='Path to the cleaned/enriched CSV file')
+    parser.add_argument('--cube_path', type=str, default='../data/aggregateCube.json.gz', help='Path of the cube file')
+    parser.add_argument('--update', action='store_true',
+                        help='Fold the rows into the existing cube instead of rebuilding it; rows identical to ones already in the cube are skipped')
+    args = parser.parse_args()
+
+    cube = AggregateCube.load(args.cube_path) if args.update and os.path.exists(args.cube_path) else None
+    cube = build_cube(args.file_path, cube)
+    cube.save(args.cube_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+import os
+import time
+
+# Every field the enrichers can request, per dataset, in query order.
+# A field maps to its sub-selection, or to None when it is a scalar.
+FIELD_REGISTRY = {
+    "psyte": {
+        "PSYTECategoryCode": None,
+        "PSYTEGroupCode": None,
+        "PSYTESegmentCode": ["description"],
+        "censusBlock": None,
+        "censusBlockGroup": None,
+        "censusBlockPopulation": None,
+        "censusBlockHouseholds": None,
+        "householdIncomeVariable": ["value", "description"],
+        "propertyValueVariable": ["value", "description"],
+        "propertyTenureVariable": ["value", "description"],
+        "propertyTypeVariable": ["value", "description"],
+        "urbanRuralVariable": ["value", "description"],
+    },
+    "coastal": {
+        "preciselyID": None,
+        "waterbodyName": None,
+        "nearestWaterbodyCounty": None,
+        "nearestWaterbodyState": None,
+        "nearestWaterbodyType": ["value", "description"],
+        "nearestWaterbodyAdjacentName": None,
+        "nearestWaterbodyAdjacentType": None,
+        "distanceToNearestCoastFeet": None,
+        "windpoolDescription": None,
+    },
+    "flood": {
+        "preciselyID": None,
+        "floodID": None,
+        "femaMapPanelIdentifier": None,
+        "floodZoneMapType": None,
+        "stateFIPS": None,
+        "floodZoneBaseFloodElevationFeet": None,
+        "floodZone": None,
+        "additionalInformation": None,
+        "baseFloodElevationFeet": None,
+        "communityNumber": None,
+        "communityStatus": None,
+        "mapEffectiveDate": None,
+        "letterOfMapRevisionDate": None,
+        "letterOfMapRevisionCaseNumber": None,
+        "floodHazardBoundaryMapInitialDate": None,
+        "floodInsuranceRateMapInitialDate": None,
+        "addressLocationElevationFeet": None,
+        "year100FloodZoneDistanceFeet": None,
+        "year500FloodZoneDistanceFeet": None,
+        "elevationProfileToClosestWaterbodyFeet": None,
+        "distanceToNearestWaterbodyFeet": None,
+        "nameOfNearestWaterbody": None,
+    },
+    "property": {
+        "livingSquareFootage": None,
+        "bedroomCount": None,
+        "bathroomCount": ["value"],
+        "saleAmount": None,
+    },
+    "parcel": {
+        "parcelID": None,
+        "parcelArea": None,
+        "elevation": None,
+        "geometry": None,
+    },
+    "building": {
+        "buildingID": None,
+        "maximumElevation": None,
+        "minimumElevation": None,
+        "buildingArea": None,
+    },
+}
+
+# Field selection profiles. A dataset missing from a profile is requested in
+# full; "field" selects a field with all its sub-fields, "field.sub" one sub-field.
+PROFILES = {
+    "full": {},
+    # What DataCleaner, the aggregate cube and the charts in 4. data_visualization.ipynb
+    # read, plus the features of notebooks 5.1, 5.2 and 6. 5. clustering_analysis.ipynb
+    # clusters on every column it does not drop, so run it on a "full" enrichment.
+    "clustering-minimal": {
+        "psyte": [
+            "PSYTEGroupCode",
+            "householdIncomeVariable.description", "propertyValueVariable.description",
+            "propertyTenureVariable.description", "propertyTypeVariable.description",
+            "urbanRuralVariable.description",
+        ],
+        "coastal": ["distanceToNearestCoastFeet"],
+        "flood": [
+            "floodZone", "communityNumber", "mapEffectiveDate", "floodHazardBoundaryMapInitialDate",
+            "floodInsuranceRateMapInitialDate", "addressLocationElevationFeet",
+            "year100FloodZoneDistanceFeet", "year500FloodZoneDistanceFeet", "distanceToNearestWaterbodyFeet",
+        ],
+        "parcel": ["parcelArea", "elevation"],
+        "building": ["maximumElevation", "minimumElevation", "buildingArea"],
+    },
+}
+
+
+def selected_fields(dataset, profile="full"):
+    """
+    Resolve a profile to {field: sub-fields or None} for one dataset, in registry order.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown field profile '{profile}'. Available profiles: {list(PROFILES)}")
+    registry = FIELD_REGISTRY[dataset]
+    selection = PROFILES[profile].get(dataset)
+    if selection is None:
+        return dict(registry)
+
+    chosen = {}
+    for entry in selection:
+        field, _, sub = entry.partition(".")
+        if field not in registry or (sub and sub not in (registry[field] or [])):
+            raise ValueError(f"Field '{entry}' is not in the {dataset} field registry.")
+        if registry[field] is None or not sub:
+            chosen[field] = registry[field]
+        else:
+            chosen[field] = (chosen.get(field) or []) + [sub]
+    return {field: ([s for s in registry[field] if s in chosen[field]] if registry[field] else None)
+            for field in registry if field in chosen}
+
+
+def selection_set(dataset, profile="full", indent=0):
+    """
+    Render the GraphQL selection set of a dataset for a profile.
+    """
+    pad = " " * indent
+    lines = []
+    for field, subfields in selected_fields(dataset, profile).items():
+        if subfields is None:
+            lines.append(f"{pad}{field}")
+        else:
+            lines.append(f"{pad}{field} {{")
+            lines.extend(f"{pad}    {sub}" for sub in subfields)
+            lines.append(f"{pad}}}")
+    return "\n".join(lines)
+
+
+def output_columns(dataset, prefix):
+    """
+    Flattened column names of a dataset under the full registry, as produced by
+    json_normalize + add_prefix. Used to keep the output columns stable whatever
+    profile was queried.
+    """
+    columns = []
+    for field, subfields in FIELD_REGISTRY[dataset].items():
+        if subfields is None:
+            columns.append(f"{prefix}_{field}")
+        else:
+            columns.extend(f"{prefix}_{field}.{sub}" for sub in subfields)
+    return columns
+
+
+def profile_filename(filename, profile):
+    """
+    Suffix an output file name with the profile (data.csv -> data_clustering-minimal.csv)
+    so that outputs of different profiles never share a file. "full" keeps the name.
+    """
+    if profile == "full":
+        return filename
+    base, ext = os.path.splitext(filename)
+    return f"{base}_{profile}{ext}"
+
+
+class ResponseStats:
+    """
+    Accumulate response payload size and JSON parse time per dataset.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.stats = {}
+
+    def parse(self, dataset, response):
+        """
+        Parse a response's JSON body, recording its size and parse time.
+        """
+        start = time.perf_counter()
+        data = response.json()
+        self.record(dataset, len(response.content), time.perf_counter() - start)
+        return data
+
+    def record(self, dataset, payload_bytes, parse_seconds):
+        dataset = dataset or "other"
+        calls, total_bytes, total_seconds = self.stats.get(dataset, (0, 0, 0.0))
+        self.stats[dataset] = (calls + 1, total_bytes + payload_bytes, total_seconds + parse_seconds)
+
+    def report(self):
+        """
+        Print payload bytes and parse time per dataset for the profile.
+        """
+        print(f"Response size for field profile '{self.profile}':")
+        print(f"{'dataset':<10} {'calls':>7} {'bytes':>12} {'bytes/call':>11} {'parse ms':>10} {'ms/call':>8}")
+        totals = [0, 0, 0.0]
+        for dataset, (calls, total_bytes, total_seconds) in self.stats.items():
+            print(f"{dataset:<10} {calls:>7} {total_bytes:>12} {total_bytes / calls:>11.0f} "
+                  f"{total_seconds * 1000:>10.1f} {total_seconds * 1000 / calls:>8.2f}")
+            totals = [totals[0] + calls, totals[1] + total_bytes, totals[2] + total_seconds]
+        if totals[0]:
+            print(f"{'total':<10} {totals[0]:>7} {totals[1]:>12} {totals[1] / totals[0]:>11.0f} "
+                  f"{totals[2] * 1000:>10.1f} {totals[2] * 1000 / totals[0]:>8.2f}")
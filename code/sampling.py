@@ -0,0 +1,196 @@
+import math
+import random
+import pandas as pd
+from aggregate_cube import AggregateCube
+
+# Columns tried, in order, when stratifying by a named dimension. The property
+# inputs use ZIPCODE / ADD_NUMBER / STREETNAME, the OpenAddresses style extracts
+# in ../data use POSTCODE / NUMBER / STREET.
+STRATA_COLUMNS = {
+    "zip": [["ZIPCODE"], ["POSTCODE"]],
+    "district": [["DISTRICT"]],
+    "building": [["ADD_NUMBER", "STREETNAME", "ZIPCODE"], ["NUMBER", "STREET", "POSTCODE"],
+                 ["ADD_NUMBER", "STREETNAME"], ["NUMBER", "STREET"]],
+}
+
+
+class StratifiedReservoirSampler:
+    """
+    Draw a (optionally stratified) sample from a stream of DataFrame chunks
+    without holding the full input in memory.
+
+    Within every stratum rows are picked by systematic selection with a random
+    start: row k is kept when floor(k * p + start) goes up, p being
+    sample_percentage / 100. Each stratum keeps n_h * p rows (rounded down or
+    up) and only those rows are held. With an API call budget of max_rows rows,
+    whenever more than twice max_rows rows are held p is halved and every
+    stratum's held rows are thinned to every other one, so memory stays below
+    2 * max_rows whatever the number of strata. Once the stream is exhausted
+    the held rows are cut down to max_rows with quotas proportional to the
+    stratum sizes.
+    """
+
+    def __init__(self, sample_percentage=100, stratify_by=None, api_budget=None,
+                 calls_per_row=1, random_state=42):
+        if not 0 < sample_percentage <= 100:
+            raise ValueError("sample_percentage must be in (0, 100]")
+        if api_budget is not None and api_budget < calls_per_row:
+            raise ValueError(f"api_budget must allow at least one row ({calls_per_row} calls)")
+        self.sample_percentage = sample_percentage
+        self.fraction = sample_percentage / 100
+        self.stratify_by = stratify_by
+        self.max_rows = api_budget // calls_per_row if api_budget is not None else None
+        self.rng = random.Random(random_state)
+        self.columns = None
+        self.seen = {}
+        self.starts = {}
+        # (stratum, record) in arrival order
+        self.picked = []
+
+    def resolve_strata_columns(self, columns):
+        """
+        Map the stratify_by option to the columns present in the input.
+        A name that is not a known dimension is treated as a column name.
+        """
+        if self.stratify_by is None:
+            return []
+        candidates = STRATA_COLUMNS.get(self.stratify_by.lower(), [[self.stratify_by]])
+        for candidate in candidates:
+            if all(col in columns for col in candidate):
+                return candidate
+        raise ValueError(f"Cannot stratify by '{self.stratify_by}': none of {candidates} found in input columns.")
+
+    def strata_keys(self, chunk, strata_columns):
+        """
+        Build the stratum key of every row in the chunk. read_csv infers dtypes
+        per chunk, so values are normalized first (19104 and 19104.0 match).
+        """
+        if not strata_columns:
+            return [None] * len(chunk)
+        parts = [AggregateCube.dimension_values(chunk[col]).fillna("") for col in strata_columns]
+        keys = parts[0]
+        for part in parts[1:]:
+            keys = keys + " " + part
+        return keys.tolist()
+
+    def add(self, chunk):
+        """
+        Feed one chunk of rows through the per-stratum systematic selection.
+        """
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self.strata_columns = self.resolve_strata_columns(self.columns)
+
+        keys = self.strata_keys(chunk, self.strata_columns)
+        for key, record in zip(keys, chunk.itertuples(index=True, name=None)):
+            seen = self.seen.get(key, 0) + 1
+            self.seen[key] = seen
+            if key not in self.starts:
+                self.starts[key] = self.rng.random()
+            start = self.starts[key]
+            if math.floor(seen * self.fraction + start) > math.floor((seen - 1) * self.fraction + start):
+                self.pick(key, record)
+
+    def pick(self, key, record):
+        """
+        Hold a picked row, thinning the held rows when they exceed twice the budget.
+        """
+        self.picked.append((key, record))
+        if self.max_rows is not None and len(self.picked) > 2 * self.max_rows:
+            self.thin()
+
+    def thin(self):
+        """
+        Halve the selection fraction and keep every other held row of each
+        stratum, starting from a random one.
+        """
+        self.fraction /= 2
+        parity, position = {}, {}
+        kept = []
+        for key, record in self.picked:
+            if key not in parity:
+                parity[key] = self.rng.randrange(2)
+            index = position.get(key, 0)
+            position[key] = index + 1
+            if index % 2 == parity[key]:
+                kept.append((key, record))
+        self.picked = kept
+
+    def allocate(self, target, available):
+        """
+        Split the target sample size across strata proportionally to the number
+        of rows seen in each, using largest remainders and capping every stratum
+        at the rows available for it.
+        """
+        total_seen = sum(self.seen.values())
+        quotas = {key: target * seen / total_seen for key, seen in self.seen.items()}
+        allocation = {key: min(int(quota), available.get(key, 0)) for key, quota in quotas.items()}
+
+        remaining = target - sum(allocation.values())
+        # Shuffle first so ties between equal remainders do not favour early strata
+        order = list(quotas)
+        self.rng.shuffle(order)
+        order.sort(key=lambda key: quotas[key] - int(quotas[key]), reverse=True)
+        while remaining > 0:
+            open_keys = [key for key in order if allocation[key] < available.get(key, 0)]
+            if not open_keys:
+                break
+            for key in open_keys[:remaining]:
+                allocation[key] += 1
+            remaining = target - sum(allocation.values())
+        return allocation
+
+    def sample(self):
+        """
+        Return the sampled rows as a DataFrame, keeping the original index.
+        """
+        if self.columns is None:
+            return pd.DataFrame()
+
+        records = [record for _, record in self.picked]
+        if self.max_rows is not None and len(records) > self.max_rows:
+            # Cut the held rows down to the budget with per-stratum quotas
+            by_stratum = {}
+            for key, record in self.picked:
+                by_stratum.setdefault(key, []).append(record)
+            available = {key: len(rows) for key, rows in by_stratum.items()}
+            records = []
+            for key, count in self.allocate(self.max_rows, available).items():
+                if count:
+                    records.extend(self.rng.sample(by_stratum[key], count))
+        records.sort(key=lambda record: record[0])
+
+        index = [record[0] for record in records]
+        rows = [record[1:] for record in records]
+        return pd.DataFrame.from_records(rows, index=index, columns=self.columns)
+
+    def summary(self):
+        """
+        Print how many rows were streamed and how many strata they fell into.
+        """
+        total_seen = sum(self.seen.values())
+        label = self.stratify_by or "all rows"
+        print(f"Streamed {total_seen} rows across {len(self.seen)} strata ({label}).")
+
+
+def stream_sample(file_path, start_row=None, end_row=None, chunksize=10000, **sampler_args):
+    """
+    Stream a CSV in chunks, restricted to rows [start_row, end_row), and return
+    the sample drawn by a StratifiedReservoirSampler.
+    """
+    if (start_row is not None and start_row < 0) or (end_row is not None and end_row < 0):
+        raise ValueError(f"Row bounds must be non-negative, got start={start_row}, end={end_row}.")
+    start_row = start_row or 0
+    sampler = StratifiedReservoirSampler(**sampler_args)
+    position = 0
+    for chunk in pd.read_csv(file_path, chunksize=chunksize, low_memory=False):
+        chunk_start, position = position, position + len(chunk)
+        if position <= start_row:
+            continue
+        if end_row is not None and chunk_start >= end_row:
+            break
+        lower = max(start_row - chunk_start, 0)
+        upper = len(chunk) if end_row is None else min(end_row - chunk_start, len(chunk))
+        sampler.add(chunk.iloc[lower:upper])
+    sampler.summary()
+    return sampler.sample()
@@ -0,0 +1,104 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from aggregate_cube import AggregateCube, build_cube
+
+TYPE = "psyte_propertyTypeVariable.description"
+INCOME = "psyte_householdIncomeVariable.description"
+URBAN = "psyte_urbanRuralVariable.description"
+NUMERIC = ["SaleAmount", "Elevation", "LivingSquareFootage", "coastal_distanceToNearestCoastFeet"]
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    n = 5000
+    frame = pd.DataFrame({
+        TYPE: rng.choice(["Single family", "Townhouses", "Mixed"], n),
+        INCOME: rng.choice(["Bottom 10%", "Middle", "Top 10%"], n),
+        URBAN: rng.choice(["Urban", "Rural"], n),
+        "ZIPCODE": rng.choice([19104, 19103, 32401], n),
+        "SaleAmount": rng.lognormal(12, 1, n),
+        "Elevation": rng.normal(10, 20, n),
+        "LivingSquareFootage": rng.normal(1500, 300, n),
+        "coastal_distanceToNearestCoastFeet": rng.exponential(5000, n),
+    })
+    frame.loc[::7, "SaleAmount"] = np.nan
+    frame.loc[::11, INCOME] = None
+    return frame
+
+
+def test_mean_matches_groupby(df):
+    cube = AggregateCube().update(df)
+    expected = df.groupby(TYPE)["SaleAmount"].mean()
+    np.testing.assert_allclose(cube.mean("SaleAmount", "property_type").sort_index(), expected)
+
+
+def test_count_matches_crosstab_and_value_counts(df):
+    cube = AggregateCube().update(df)
+    expected = pd.crosstab(df[INCOME], df[TYPE])
+    np.testing.assert_array_equal(cube.count("income", "property_type").sort_index().values, expected.values)
+    assert cube.count("zip").to_dict() == {str(k): v for k, v in df["ZIPCODE"].value_counts().items()}
+
+
+def test_corr_matches_pandas(df):
+    cube = AggregateCube().update(df)
+    np.testing.assert_allclose(cube.corr(NUMERIC).values, df[NUMERIC].corr().values, atol=1e-12)
+
+
+def test_describe_quartiles_within_sketch_accuracy(df):
+    cube = AggregateCube().update(df)
+    got, expected = cube.describe("SaleAmount"), df["SaleAmount"].describe()
+    for stat in ["count", "mean", "std", "min", "max"]:
+        assert got[stat] == pytest.approx(expected[stat])
+    for stat in ["25%", "50%", "75%"]:
+        assert got[stat] == pytest.approx(expected[stat], rel=0.02)
+
+
+def test_quantile_crosstab_close_to_qcut(df):
+    cube = AggregateCube().update(df)
+    got = cube.quantile_crosstab("coastal_distanceToNearestCoastFeet", "urban_rural", q=5)
+    bins = pd.qcut(df["coastal_distanceToNearestCoastFeet"], 5, labels=got.columns)
+    expected = pd.crosstab(df[URBAN], bins)
+    assert (got.sum(axis=1).values == expected.sum(axis=1).values).all()
+    assert np.abs(got.values - expected.values).max() <= 0.02 * len(df)
+
+
+def test_chunked_updates_equal_single_build(df):
+    whole = AggregateCube().update(df)
+    chunked = AggregateCube().update(df.iloc[:1234]).update(df.iloc[1234:])
+    pd.testing.assert_frame_equal(chunked.count("income", "property_type"), whole.count("income", "property_type"))
+    np.testing.assert_allclose(chunked.sum("SaleAmount", "zip"), whole.sum("SaleAmount", "zip"))
+
+
+def test_save_load_round_trip(df, tmp_path):
+    path = str(tmp_path / "cube.json.gz")
+    cube = AggregateCube().update(df)
+    cube.save(path)
+    loaded = AggregateCube.load(path)
+    pd.testing.assert_frame_equal(loaded.count("urban_rural", "property_type"), cube.count("urban_rural", "property_type"))
+    assert loaded.quantile("Elevation", 0.5) == cube.quantile("Elevation", 0.5)
+
+
+def test_update_skips_rows_already_in_cube_but_keeps_repeats_in_input(df, tmp_path):
+    path = str(tmp_path / "cube.json.gz")
+    AggregateCube().update(df).save(path)
+
+    cube = AggregateCube.load(path)
+    extra = pd.concat([df.iloc[:10], df.iloc[[0, 0]].assign(SaleAmount=1.0)])
+    cube.update(extra)
+    assert cube.rows == len(df) + 2
+    assert cube.duplicates == 10
+
+    repeated = pd.concat([df, df.iloc[:5]])
+    assert AggregateCube().update(repeated).rows == len(df) + 5
+
+
+def test_covers_tracks_source_version(df, tmp_path):
+    path = tmp_path / "cleaned.csv"
+    df.to_csv(path, index=False)
+    cube = build_cube(path)
+    assert cube.covers(path)
+    os.utime(path, (0, 0))
+    assert not cube.covers(path)
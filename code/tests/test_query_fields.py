@@ -0,0 +1,65 @@
+import re
+import pytest
+from query_fields import FIELD_REGISTRY, PROFILES, output_columns, profile_filename, selected_fields, selection_set
+
+
+def test_full_profile_selects_whole_registry():
+    for dataset, fields in FIELD_REGISTRY.items():
+        assert selected_fields(dataset, "full") == fields
+    assert len(re.findall(r"^\s*\w+\s*$", selection_set("flood", "full"), re.M)) == 22
+
+
+def test_clustering_minimal_selection():
+    assert selected_fields("psyte", "clustering-minimal") == {
+        "PSYTEGroupCode": None,
+        "householdIncomeVariable": ["description"],
+        "propertyValueVariable": ["description"],
+        "propertyTenureVariable": ["description"],
+        "propertyTypeVariable": ["description"],
+        "urbanRuralVariable": ["description"],
+    }
+    assert selected_fields("coastal", "clustering-minimal") == {"distanceToNearestCoastFeet": None}
+    assert "letterOfMapRevisionCaseNumber" not in selected_fields("flood", "clustering-minimal")
+    assert selected_fields("property", "clustering-minimal") == FIELD_REGISTRY["property"]
+    assert "geometry" not in selected_fields("parcel", "clustering-minimal")
+
+
+def test_minimal_profile_covers_cleaner_and_cube_columns():
+    from aggregate_cube import DIMENSIONS
+    needed = {
+        "flood_communityNumber", "flood_addressLocationElevationFeet", "flood_year100FloodZoneDistanceFeet",
+        "flood_year500FloodZoneDistanceFeet", "flood_distanceToNearestWaterbodyFeet", "flood_mapEffectiveDate",
+        "flood_floodHazardBoundaryMapInitialDate", "flood_floodInsuranceRateMapInitialDate",
+        "coastal_distanceToNearestCoastFeet",
+    }
+    needed |= {col for cols in DIMENSIONS.values() for col in cols if col.startswith("psyte_")}
+    selected = set()
+    for dataset in ("psyte", "coastal", "flood"):
+        for field, subfields in selected_fields(dataset, "clustering-minimal").items():
+            names = [field] if subfields is None else [f"{field}.{sub}" for sub in subfields]
+            selected |= {f"{dataset}_{name}" for name in names}
+    assert needed <= selected
+
+
+def test_selection_set_renders_sub_selections():
+    rendered = selection_set("psyte", "clustering-minimal", indent=2)
+    assert rendered.splitlines()[:4] == ["  PSYTEGroupCode", "  householdIncomeVariable {", "      description", "  }"]
+
+
+def test_unknown_profile_and_field_are_rejected(monkeypatch):
+    with pytest.raises(ValueError):
+        selected_fields("flood", "tiny")
+    monkeypatch.setitem(PROFILES, "broken", {"flood": ["floodZone.value"]})
+    with pytest.raises(ValueError):
+        selected_fields("flood", "broken")
+
+
+def test_output_columns_follow_json_normalize_names():
+    columns = output_columns("coastal", "coastal")
+    assert "coastal_nearestWaterbodyType.value" in columns
+    assert len(columns) == 10
+
+
+def test_profile_filename():
+    assert profile_filename("../data/out.csv", "full") == "../data/out.csv"
+    assert profile_filename("../data/out.csv", "clustering-minimal") == "../data/out_clustering-minimal.csv"
@@ -0,0 +1,90 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from sampling import StratifiedReservoirSampler, stream_sample
+
+
+def zip_frame(sizes):
+    zips = np.concatenate([np.full(size, zipcode) for zipcode, size in sizes.items()])
+    return pd.DataFrame({"ZIPCODE": zips, "value": np.arange(len(zips))})
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_small_stratum_is_represented_without_budget(seed):
+    df = zip_frame({19104: 19990, 19103: 10}).sample(frac=1, random_state=seed)
+    sampler = StratifiedReservoirSampler(sample_percentage=10, stratify_by="zip", random_state=seed)
+    sampler.add(df)
+    counts = sampler.sample()["ZIPCODE"].value_counts()
+    assert counts[19103] == 1
+    assert counts.sum() == 2000
+
+
+def test_stratum_counts_are_rounded_share():
+    sizes = {1: 1234, 2: 57, 3: 9, 4: 700}
+    sampler = StratifiedReservoirSampler(sample_percentage=15, stratify_by="zip")
+    sampler.add(zip_frame(sizes))
+    counts = sampler.sample()["ZIPCODE"].value_counts()
+    for zipcode, size in sizes.items():
+        assert counts.get(zipcode, 0) in (math.floor(size * 0.15), math.ceil(size * 0.15))
+
+
+def test_sample_keeps_original_index_and_rows():
+    df = zip_frame({1: 100, 2: 100})
+    sampler = StratifiedReservoirSampler(sample_percentage=20, stratify_by="zip")
+    sampler.add(df)
+    sample = sampler.sample()
+    pd.testing.assert_frame_equal(sample, df.loc[sample.index], check_dtype=False)
+
+
+def test_budget_bounds_memory_across_many_strata():
+    df = pd.DataFrame({"NUMBER": np.arange(20000), "STREET": "MARKET ST", "POSTCODE": 19104})
+    sampler = StratifiedReservoirSampler(stratify_by="building", api_budget=30, calls_per_row=3)
+    for start in range(0, len(df), 1000):
+        sampler.add(df.iloc[start:start + 1000])
+        assert len(sampler.picked) <= 20
+    assert len(sampler.sample()) == 10
+
+
+def test_budget_sample_is_split_proportionally():
+    sampler = StratifiedReservoirSampler(stratify_by="zip", api_budget=300, calls_per_row=3)
+    sampler.add(zip_frame({1: 6000, 2: 3000, 3: 1000}))
+    counts = sampler.sample()["ZIPCODE"].value_counts()
+    assert counts.to_dict() == {1: 60, 2: 30, 3: 10}
+
+
+def test_allocate_uses_largest_remainders_and_caps():
+    sampler = StratifiedReservoirSampler(stratify_by="zip")
+    sampler.seen = {"a": 5, "b": 3, "c": 2}
+    allocation = sampler.allocate(5, {"a": 10, "b": 10, "c": 10})
+    assert sum(allocation.values()) == 5
+    assert allocation["a"] in (2, 3) and allocation["b"] in (1, 2) and allocation["c"] == 1
+    assert sampler.allocate(5, {"a": 1, "b": 1, "c": 10}) == {"a": 1, "b": 1, "c": 3}
+
+
+def test_strata_keys_match_across_chunk_dtypes(tmp_path):
+    path = tmp_path / "input.csv"
+    zips = [19104, 19103, 32401] * 4
+    rows = pd.DataFrame({"ZIPCODE": zips, "value": range(len(zips))}).astype({"ZIPCODE": object})
+    rows.loc[7, "ZIPCODE"] = None
+    rows.to_csv(path, index=False)
+    sampler = StratifiedReservoirSampler(stratify_by="zip")
+    for chunk in pd.read_csv(path, chunksize=6):
+        sampler.add(chunk)
+    assert set(sampler.seen) == {"19104", "19103", "32401", ""}
+
+
+def test_stream_sample_respects_row_range(tmp_path):
+    path = tmp_path / "input.csv"
+    zip_frame({1: 50, 2: 50}).to_csv(path, index=False)
+    sample = stream_sample(path, 10, 60, chunksize=7)
+    assert list(sample.index) == list(range(10, 60))
+
+
+def test_stream_sample_rejects_negative_bounds(tmp_path):
+    path = tmp_path / "input.csv"
+    zip_frame({1: 10}).to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        stream_sample(path, -5, None)
+    with pytest.raises(ValueError):
+        stream_sample(path, 0, -1)